@@ -6,6 +6,11 @@ from typing import Dict
 import yaml
 from pydantic import BaseModel, EmailStr, Field
 
+try:  # libyaml-backed parser when PyYAML was built with it
+    from yaml import CSafeLoader as _Loader
+except ImportError:  # pure-Python fallback
+    from yaml import SafeLoader as _Loader
+
 
 class AppSettings(BaseModel):
     """Strongly-typed application configuration."""
@@ -24,10 +29,21 @@ APP_DIR: Path = Path("src/label_app")
 DEFAULT_SETTINGS_PATH: Path = APP_DIR / "app_settings.yaml"
 
 
-@st.cache_data(show_spinner=False, ttl="15m")
+# bounded: each edit of the file produces a new (path, mtime_ns) key
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _load_settings(path: Path, mtime_ns: int) -> AppSettings:
+    """Parse *path*; `mtime_ns` only keys the cache so edits to the file invalidate it."""
+    with path.open("r", encoding="utf-8") as f:
+        data = yaml.load(f, Loader=_Loader) or {}
+
+    return AppSettings(**data)
+
+
 def get_settings(path: Path | str = DEFAULT_SETTINGS_PATH) -> AppSettings:
     """Return a cached :class:`AppSettings` instance loaded from *path*.
 
+    The file is re-parsed only when its modification time changes.
+
     Parameters
     ----------
     path:
@@ -35,12 +51,9 @@ def get_settings(path: Path | str = DEFAULT_SETTINGS_PATH) -> AppSettings:
     """
     path = Path(path)
     try:
-        with path.open("r", encoding="utf-8") as f:
-            data = yaml.safe_load(f) or {}
+        mtime_ns = path.stat().st_mtime_ns
+        return _load_settings(path, mtime_ns)
     except FileNotFoundError as exc:
         raise FileNotFoundError(
             f"Settings file not found at '{path}'. Create it or pass a custom path."
         ) from exc
-
-    return AppSettings(**data)
-
@@ -171,4 +171,4 @@ def make_project(
         "repo_path": repo_path,
         "project_root": project_root,
     }
-    return Project.model_validate(merged)   # discriminator magic
+    return Project.model_validate(merged)   # one variant for now: resolves to ChatProject
@@ -0,0 +1,36 @@
+"""
+_cache.py — process-wide memoized helpers shared by the service modules.
+
+Everything here is pure and keyed by immutable inputs, so results are safe to
+reuse across Streamlit reruns, sessions and background threads.
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+from typing import TypeVar
+
+from pydantic import TypeAdapter
+
+_T = TypeVar("_T")
+
+_UNSAFE_PATH_CHARS = re.compile(r"[^a-zA-Z0-9._-]")
+
+
+@functools.lru_cache(maxsize=None)
+def adapter_for(model: type[_T]) -> TypeAdapter[_T]:
+    """Validator for a single `model` instance, built once per class."""
+    return TypeAdapter(model)
+
+
+@functools.lru_cache(maxsize=None)
+def list_adapter_for(model: type[_T]) -> TypeAdapter[list[_T]]:
+    """Validator for a JSON array of `model` instances, built once per class."""
+    return TypeAdapter(list[model])
+
+
+@functools.lru_cache(maxsize=256)
+def safe_email(email: str) -> str:
+    """Filesystem-safe form of an email, used for per-user directories and files."""
+    return _UNSAFE_PATH_CHARS.sub("_", email)
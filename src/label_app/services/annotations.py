@@ -1,18 +1,18 @@
-import json
+import functools
 import os
-import re
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Iterable, Type, TypeVar
 
 import streamlit as st
-from git import Repo
-from pydantic import TypeAdapter, ValidationError
+from pydantic import ValidationError
 
 from label_app.data.models import Project, User, ItemBase, AnnotationBase
+from label_app.services._cache import adapter_for, safe_email
 from label_app.services.github import get_responsible_tracker
-from label_app.services.items import load_items_by_file, load_items, load_file_items
+from label_app.services.items import load_items_by_file, load_file_items
 
 MAX_ERRS_TO_SHOW = 5
 
@@ -22,13 +22,16 @@ def _annotation_path_for_key(root: Path, email: str, key: Path) -> Path:
     Map a dataset key (relative to project root) to the per-user annotation JSON file.
     E.g. key='source/train.jsonl' -> 'annotation/<email>/source/train.jsonl'
     """
-    safe_email = re.sub(r"[^a-zA-Z0-9._-]", "_", email)
-    target = (root / "annotation" / safe_email / key)
+    target = (root / "annotation" / safe_email(email) / key)
     return target.with_suffix(".jsonl")
 
 
 def _atomic_write_lines(path: Path, lines: Iterable[str]) -> None:
-    """Atomically write text lines (newline-terminated) to a file."""
+    """
+    Atomically write text lines (newline-terminated) to a file.
+
+    The directory entry is not fsynced here; callers batch that via `_fsync_dirs`.
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
     tmp = path.with_suffix(path.suffix + ".tmp")
     try:
@@ -42,32 +45,39 @@ def _atomic_write_lines(path: Path, lines: Iterable[str]) -> None:
             f.flush()
             os.fsync(f.fileno())
         os.replace(tmp, path)
-        # best-effort durability for the directory entry
+    except Exception:
+        try:
+            tmp.unlink()
+        except Exception:
+            pass
+        raise
+
+
+def _fsync_dirs(dirs: Iterable[Path]) -> None:
+    """Best-effort durability for renamed directory entries; one fsync per directory."""
+    for directory in set(dirs):
         try:
-            dir_fd = os.open(str(path.parent), os.O_DIRECTORY)
+            dir_fd = os.open(str(directory), os.O_DIRECTORY)
             try:
                 os.fsync(dir_fd)
             finally:
                 os.close(dir_fd)
         except Exception:
             pass
-    except Exception:
-        try:
-            tmp.unlink()
-        except Exception:
-            pass
-        raise
 
 
 def _to_json(annotation: AnnotationBase) -> str:
-    return json.dumps(annotation.model_dump(mode="json"), ensure_ascii=False, separators=(",", ":"))
+    # pydantic-core serializes straight to compact JSON, keeping non-ASCII as UTF-8
+    return annotation.model_dump_json()
 
 
 def read_annotations(annot_cls: Type[AnnotationBase], path: Path, items: list[ItemBase]) -> list[str]:
     """Read annotations as raw lines; strip newline terminators, keep content as-is."""
     if path.exists():
-        with path.open("r", encoding="utf-8-sig", newline="") as f:
-            result = [ln.rstrip("\r\n") for ln in f]
+        result = path.read_bytes().decode("utf-8-sig").split("\n")
+        if not result[-1]:
+            result.pop()  # trailing terminator (or empty file), not a line
+        result = [ln.rstrip("\r") for ln in result]
 
         if len(result) == len(items):
             return result
@@ -93,47 +103,65 @@ def load_file_annotations(
         print(f"[annotation] Path does not exist, creating empty annotations")
         return [annot_cls.empty_for(item) for item in items]
 
-    adapter = TypeAdapter(annot_cls)
+    adapter = adapter_for(annot_cls)
     annotations = []
 
-    with path.open("rb") as f:
-        for lineno, raw in enumerate(f):
-            # Trim whitespace once, then handle blank/comment lines
-            raw = raw.strip()
-            if not raw:
-                continue
+    for lineno, raw in enumerate(path.read_bytes().split(b"\n")):
+        # Trim whitespace once, then handle blank/comment lines
+        raw = raw.strip()
+        if not raw:
+            continue
 
-            # skip comments
-            if raw.startswith(b"#") or raw.startswith(b"//"):
-                continue
+        # skip comments
+        if raw.startswith(b"#") or raw.startswith(b"//"):
+            continue
 
-            try:
-                annotation: _AnnotationType = adapter.validate_json(raw)
-                # attach derived (non-serialized) metadata
-                annotation.item = items[lineno]
-                annotations.append(annotation)
-            except ValidationError as e:
-                print(f"[load_file_annotations] {path}:{lineno}: {e}")
+        try:
+            annotation: _AnnotationType = adapter.validate_json(raw)
+            # attach derived (non-serialized) metadata
+            annotation.item = items[lineno]
+            annotations.append(annotation)
+        except ValidationError as e:
+            print(f"[load_file_annotations] {path}:{lineno}: {e}")
 
     return annotations
 
 
 def load_per_user_annotations(project: Project) -> dict[str, list[AnnotationBase]]:
-    items = load_items(project)
+    keys = list(load_items_by_file(project))
     user_emails = [p.name for p in project.project_root.joinpath("annotation").iterdir()]
 
     annot_cls = project.annotation_model()
     item_cls = project.item_model()
 
+    def load(email: str, key: Path) -> list[AnnotationBase]:
+        file_items = load_file_items(item_cls, key, project.project_root)
+        return load_file_annotations(annot_cls, email, key, project.project_root, file_items)
+
+    # one task per (user, file); validation runs in pydantic-core, so threads overlap well
+    tasks = [(email, key) for email in user_emails for key in keys]
     result = defaultdict(list)
-    for email in user_emails:
-        for item in items:
-            file_items = load_file_items(item_cls, item.key, project.project_root)
-            annotations = load_file_annotations(annot_cls, email, item.key, project.project_root, file_items)
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for (email, _), annotations in zip(tasks, executor.map(lambda task: load(*task), tasks)):
             result[email].extend(annotations)
     return result
 
 
+@functools.lru_cache(maxsize=4096)
+def _checked_key(project_root: Path, key: Path) -> Path:
+    """
+    Return `key` as a Path after ensuring it stays inside `project_root`.
+    Only successful checks are cached, so each dataset file is resolved once.
+    """
+    try:
+        rel_key = Path(key)  # should already be relative
+        # Resolve a *candidate* on disk and ensure it stays inside the repo when rooted
+        (project_root / rel_key).resolve().relative_to(project_root)
+    except Exception:
+        raise ValueError(f"Annotation key must be a path relative to project root: {key!r}")
+    return rel_key
+
+
 def save_annotations(project: Project, user: User, annotations: Iterable[AnnotationBase]) -> None:
     """
     Persist annotations to disk and **stage** modified files only.
@@ -142,90 +170,98 @@ def save_annotations(project: Project, user: User, annotations: Iterable[Annotat
     is responsible for batching commits (staged-only) and pushing to GitHub.
     """
     items = load_items_by_file(project)  # cached so cheap
-    repo = Repo(project.repo_path)
     project_root = Path(project.project_root).resolve()
 
     # --- 0) Verify types and group by key --------------------------------------
     annot_cls: Type[AnnotationBase] = project.annotation_model()
 
-    grouped: dict[Path, list[AnnotationBase]] = defaultdict(list)
-    max_idx_by_key: dict[Path, int] = defaultdict(int)
+    # keyed by str(key): str hashing is C-level, Path hashing rebuilds the string
+    grouped: dict[str, list[AnnotationBase]] = defaultdict(list)
+    max_idx_by_key: dict[str, int] = defaultdict(int)
+    rel_keys: dict[str, Path] = {}
+    n_items_by_key: dict[str, int] = {}
 
     for ann in annotations:
         if not isinstance(ann, annot_cls):
             raise TypeError(
                 f"Annotation type mismatch: expected {annot_cls.__name__}, got {type(ann).__name__}"
             )
-        # Validate that key is relative to project root (and safe)
-        try:
-            rel_key = Path(ann.item.key)  # should already be relative
-            # Resolve a *candidate* on disk and ensure it stays inside the repo when rooted
-            (project_root / rel_key).resolve().relative_to(project_root)
-        except Exception:
-            raise ValueError(f"Annotation key must be a path relative to project root: {ann.item.key!r}")
+        key_str = str(ann.item.key)
+        if key_str not in rel_keys:
+            # Validate that key is relative to project root (and safe)
+            rel_keys[key_str] = _checked_key(project_root, ann.item.key)
+            n_items_by_key[key_str] = len(items[rel_keys[key_str]])
 
         if ann.item.idx < 0:
             raise ValueError(f"Annotation idx must be >= 0; "
-                             f"got {ann.item.idx} for key {rel_key}")
+                             f"got {ann.item.idx} for key {key_str}")
 
-        local_items = items[rel_key]
-        if ann.item.idx >= len(local_items):
+        if ann.item.idx >= n_items_by_key[key_str]:
             raise ValueError(f"Annotation idx exceeds number of items; "
-                             f"got {ann.item.idx} for #items = {len(local_items)} for key {rel_key}")
+                             f"got {ann.item.idx} for #items = {n_items_by_key[key_str]} for key {key_str}")
 
-        grouped[rel_key].append(ann)
-        if ann.item.idx > max_idx_by_key[rel_key]:
-            max_idx_by_key[rel_key] = ann.item.idx
+        grouped[key_str].append(ann)
+        if ann.item.idx > max_idx_by_key[key_str]:
+            max_idx_by_key[key_str] = ann.item.idx
 
     if not grouped:
         return
 
     # --- For each key: read raw lines, apply diffs, write+stage only if changed --
     staged_paths: list[str] = []
+    replaced_dirs: set[Path] = set()
     files_updated = 0
     rows_written_total = 0
 
-    for key, new_anns in grouped.items():
-        local_items = items[key]
-
-        ann_path = _annotation_path_for_key(project_root, user.email, key).resolve()
-
-        # 1) Read existing JSONL as raw lines (or filler if missing)
-        lines = read_annotations(annot_cls, ann_path, items=local_items)
-        if len(lines) != len(local_items):
-            raise ValueError(f"Broken file at {key}: Number of read annotations does not match number of items")
-
-        # 2) Apply only effective changes
-        changed = False
-        for ann in new_anns:
-            pos = ann.item.idx
-            new_line = _to_json(ann)
-            if lines[pos] != new_line:
-                lines[pos] = new_line
-                changed = True
-
-        if not changed:
-            # Nothing to write or stage for this file
-            continue
+    # All keys live under the same project root, hence the same tracker. Writing,
+    # staging and committing form one critical section so the monitor thread can't
+    # pull/rebase or reset the checkout while it holds uncommitted files.
+    tracker = get_responsible_tracker(project_root)
+    with tracker.repo_lock:
+        for key_str, new_anns in grouped.items():
+            key = rel_keys[key_str]
+            local_items = items[key]
+
+            # 1) Serialize once per row; later annotations for the same idx win
+            new_lines = {ann.item.idx: _to_json(ann) for ann in new_anns}
+
+            ann_path = _annotation_path_for_key(project_root, user.email, key).resolve()
+
+            # 2) Read existing JSONL as raw lines (or filler if missing)
+            lines = read_annotations(annot_cls, ann_path, items=local_items)
+            if len(lines) != len(local_items):
+                raise ValueError(f"Broken file at {key}: Number of read annotations does not match number of items")
+
+            # 3) Apply only effective changes
+            changed = False
+            for pos, new_line in new_lines.items():
+                if lines[pos] != new_line:
+                    lines[pos] = new_line
+                    changed = True
+
+            if not changed:
+                # Nothing to write or stage for this file
+                continue
 
-        tracker = get_responsible_tracker(ann_path)
-        with tracker.repo_lock:
-            tracker.ensure_staging_branch()
+            if not staged_paths:
+                tracker.ensure_staging_branch()
 
-            # 3) Persist atomically
+            # 4) Persist atomically (readers don't take the repo lock)
             _atomic_write_lines(ann_path, lines)
+            replaced_dirs.add(ann_path.parent)
 
-            # 4) Stage the updated file
-            rel = str(ann_path.relative_to(repo.working_dir))
-            repo.index.add([rel])
-            staged_paths.append(rel)
+            staged_paths.append(str(ann_path.relative_to(tracker.repo.working_dir)))
             files_updated += 1
             rows_written_total += len(lines)
 
-            tracker.auto_commit(force=True)
+        if not staged_paths:
+            return
 
-    if not staged_paths:
-        return
+        _fsync_dirs(replaced_dirs)
+
+        # 5) Stage all updated files at once (the index is rewritten per add call)
+        tracker.repo.index.add(staged_paths)
+        tracker.auto_commit(force=True)
 
     print(f"[annotations] Staged {files_updated} file{'s' if files_updated != 1 else ''} "
           f"({rows_written_total} rows total). ")
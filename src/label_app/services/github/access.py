@@ -13,6 +13,15 @@ from typing import TypedDict
 
 import requests
 from .config import GH_API, USER_AGENT
+from .session import GH_SESSION
+
+
+# Headers for unauthenticated GitHub REST calls (never mutated)
+_HEADERS_PUBLIC = {
+    "Accept": "application/vnd.github+json",
+    "X-GitHub-Api-Version": "2022-11-28",
+    "User-Agent": USER_AGENT,
+}
 
 
 class RepoAccess(TypedDict):
@@ -21,15 +30,6 @@ class RepoAccess(TypedDict):
     write_ok: bool
 
 
-def _headers_public() -> dict:
-    """Headers for unauthenticated GitHub REST calls."""
-    return {
-        "Accept": "application/vnd.github+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-        "User-Agent": USER_AGENT,
-    }
-
-
 def _is_repo_public(owner: str, repo: str) -> bool:
     """
     Return True if the repository is public (readable without app installation).
@@ -40,7 +40,7 @@ def _is_repo_public(owner: str, repo: str) -> bool:
       - 404 or other errors       -> treat as not public
     """
     try:
-        r = requests.get(f"{GH_API}/repos/{owner}/{repo}", headers=_headers_public(), timeout=10)
+        r = GH_SESSION.get(f"{GH_API}/repos/{owner}/{repo}", headers=_HEADERS_PUBLIC, timeout=10)
         if r.status_code == 200:
             data = r.json()
             return not bool(data.get("private", True))
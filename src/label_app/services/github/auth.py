@@ -21,7 +21,14 @@ Design notes
 
 - Tokens are cached **per installation id** until within 5 minutes of expiry.
   The cache stores the token string, expiry, and the permission map returned by
-  GitHub. The cache is guarded by a lock for thread safety.
+  GitHub. The cache is guarded by locks striped by installation id, so
+  lookups for unrelated installations don't contend.
+
+- The repository -> installation id mapping is cached for a few minutes so a
+  cached token can be served without any request to GitHub. Failed lookups
+  are never cached, and a mapping is evicted as soon as minting a token for it
+  answers 401/404 (the App was uninstalled or reinstalled meanwhile). A 401
+  also discards the cached App JWT before the single retry.
 
 - `_get_cached_installation_token(..., require_write=True)` only returns a
   cached token if it is still valid **and** the cached permission includes
@@ -31,16 +38,17 @@ Design notes
 
 from __future__ import annotations
 
+import calendar
 import threading
 import time
-from datetime import datetime, timezone
 from typing import Any
 
 import jwt
-import requests
+from requests import HTTPError
 
-from .config import CLIENT_ID, APP_PRIVATE_KEY, USER_AGENT, GH_API
+from .config import CLIENT_ID, APP_PRIVATE_KEY_OBJ, USER_AGENT, GH_API
 from .errors import GitHubNotInstalledError, GitHubPermissionError
+from .session import GH_SESSION
 
 # --------------------------------------------------------------------------- #
 # Configuration
@@ -54,18 +62,47 @@ _JWT_IAT_SKEW_SECONDS = 30
 _JWT_LIFETIME_SECONDS = 8 * 60
 # How soon before expiry we consider a token "stale" and force a refresh
 _TOKEN_REFRESH_SLOP_SECONDS = 300  # 5 minutes
+# How soon before expiry we stop reusing a signed App JWT
+_JWT_REUSE_SLOP_SECONDS = 60
+# How long a repository -> installation id mapping is reused
+_INSTALLATION_ID_TTL_SECONDS = 10 * 60
+
+# Headers recommended by GitHub for REST API calls (never mutated)
+_HEADERS_COMMON = {
+    "Accept": "application/vnd.github+json",
+    "X-GitHub-Api-Version": "2022-11-28",
+    "User-Agent": USER_AGENT,
+}
 
 # --------------------------------------------------------------------------- #
 # In-memory token cache (installation_id -> token bundle)
 # --------------------------------------------------------------------------- #
 
-_token_cache: dict[int, dict[str, Any]] = {}  # {"token", "expires_at", "permissions"}
-_token_cache_lock = threading.Lock()
+_token_cache: dict[int, dict[str, Any]] = {}  # {"token", "expires_at", "expires_at_ts", "permissions"}
+_TOKEN_LOCK_STRIPES = 16  # power of two, see _lock_for
+_token_cache_locks = [threading.Lock() for _ in range(_TOKEN_LOCK_STRIPES)]
+
+# The App JWT is signed with RSA, so one signature is reused for most of its lifetime
+_app_jwt_cache: dict[str, Any] = {"jwt": None, "exp": 0}
+_app_jwt_lock = threading.Lock()
+
+# installation_id -> Event set once the in-flight mint for it finishes
+_pending_mints: dict[int, threading.Event] = {}
+_pending_mints_lock = threading.Lock()
+
+# (owner, repo) -> (installation_id, resolved_at)
+_installation_id_cache: dict[tuple[str, str], tuple[int, int]] = {}
+_installation_id_cache_lock = threading.Lock()
+
+
+def _lock_for(installation_id: int) -> threading.Lock:
+    """Lock stripe guarding the cache entry of `installation_id`."""
+    return _token_cache_locks[installation_id & (_TOKEN_LOCK_STRIPES - 1)]
 
 
 def _now_ts() -> int:
     """Current epoch seconds."""
-    return int(time.time())
+    return time.time_ns() // 1_000_000_000
 
 
 def _iso8601_to_ts(s: str) -> int:
@@ -73,35 +110,46 @@ def _iso8601_to_ts(s: str) -> int:
     Parse timestamps like '2024-01-01T12:00:00Z' into epoch seconds.
     GitHub returns `expires_at` in this Zulu ISO 8601 format.
     """
-    return int(datetime.strptime(s, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp())
+    return calendar.timegm((
+        int(s[0:4]), int(s[5:7]), int(s[8:10]),
+        int(s[11:13]), int(s[14:16]), int(s[17:19]),
+        0, 0, 0,
+    ))
 
 
 def _make_app_jwt() -> str:
     """
     Create a signed JWT to authenticate as the GitHub App itself.
-    Valid for < 10 minutes as required by GitHub.
+    Valid for < 10 minutes as required by GitHub; reused until shortly before expiry.
     """
     now = _now_ts()
+    with _app_jwt_lock:
+        if _app_jwt_cache["jwt"] is not None and now < _app_jwt_cache["exp"] - _JWT_REUSE_SLOP_SECONDS:
+            return _app_jwt_cache["jwt"]
+
     payload = {
         "iat": now - _JWT_IAT_SKEW_SECONDS,
         "exp": now + _JWT_LIFETIME_SECONDS,
         "iss": CLIENT_ID,
     }
-    return jwt.encode(payload, APP_PRIVATE_KEY, algorithm="RS256")
+    app_jwt = jwt.encode(payload, APP_PRIVATE_KEY_OBJ, algorithm="RS256")
 
+    with _app_jwt_lock:
+        _app_jwt_cache["jwt"] = app_jwt
+        _app_jwt_cache["exp"] = payload["exp"]
+    return app_jwt
 
-def _headers_common() -> dict:
-    """Headers recommended by GitHub for REST API calls."""
-    return {
-        "Accept": "application/vnd.github+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-        "User-Agent": USER_AGENT,
-    }
+
+def _evict_app_jwt() -> None:
+    """Drop the cached App JWT so the next request signs a fresh one."""
+    with _app_jwt_lock:
+        _app_jwt_cache["jwt"] = None
+        _app_jwt_cache["exp"] = 0
 
 
 def _headers_as_app() -> dict:
     """Auth headers for requests made as the App (using the App JWT)."""
-    return {"Authorization": f"Bearer {_make_app_jwt()}", **_headers_common()}
+    return {"Authorization": f"Bearer {_make_app_jwt()}", **_HEADERS_COMMON}
 
 
 def _create_installation_token(installation_id: int, repositories: list[str] | None = None) -> dict:
@@ -120,7 +168,7 @@ def _create_installation_token(installation_id: int, repositories: list[str] | N
     if repositories:
         payload["repositories"] = repositories
 
-    r = requests.post(url, headers=_headers_as_app(), json=payload, timeout=_REQUEST_TIMEOUT)
+    r = GH_SESSION.post(url, headers=_headers_as_app(), json=payload, timeout=_REQUEST_TIMEOUT)
     r.raise_for_status()
     return r.json()
 
@@ -130,7 +178,7 @@ def _get_cached_installation_token(installation_id: int, *, require_write: bool
     Return a cached token if it exists, isn’t near expiry, and (if requested)
     carries `contents: write` permission.
     """
-    with _token_cache_lock:
+    with _lock_for(installation_id):
         entry = _token_cache.get(installation_id)
 
     if not entry:
@@ -142,12 +190,52 @@ def _get_cached_installation_token(installation_id: int, *, require_write: bool
         return None
 
     # Refresh if < slop window left
-    if _now_ts() > _iso8601_to_ts(entry["expires_at"]) - _TOKEN_REFRESH_SLOP_SECONDS:
+    if _now_ts() > entry["expires_at_ts"] - _TOKEN_REFRESH_SLOP_SECONDS:
         return None
 
     return entry["token"]
 
 
+def _mint_installation_token(installation_id: int) -> dict[str, Any]:
+    """
+    Mint a token for `installation_id`, store it in the cache and return the entry.
+
+    Concurrent misses for the same installation are coalesced: the first caller
+    mints, the others wait for it and reuse the freshly cached entry.
+    """
+    with _pending_mints_lock:
+        event = _pending_mints.get(installation_id)
+        leader = event is None
+        if leader:
+            event = _pending_mints[installation_id] = threading.Event()
+
+    if not leader:
+        event.wait(_REQUEST_TIMEOUT)
+        with _lock_for(installation_id):
+            entry = _token_cache.get(installation_id)
+        if entry and _now_ts() <= entry["expires_at_ts"] - _TOKEN_REFRESH_SLOP_SECONDS:
+            return entry
+        # The leading mint failed or timed out; try again ourselves
+        return _mint_installation_token(installation_id)
+
+    try:
+        tok = _create_installation_token(installation_id)
+        entry = {
+            "token": tok["token"],
+            "permissions": (tok.get("permissions") or {}),
+            "expires_at": tok["expires_at"],
+            # Parsed once at mint time so cache hits only compare ints
+            "expires_at_ts": _iso8601_to_ts(tok["expires_at"]),
+        }
+        with _lock_for(installation_id):
+            _token_cache[installation_id] = entry
+        return entry
+    finally:
+        with _pending_mints_lock:
+            _pending_mints.pop(installation_id, None)
+        event.set()
+
+
 def get_installation_id_for_repo(owner: str, repo: str) -> int:
     """
     Return the installation id that covers this specific repository.
@@ -161,7 +249,7 @@ def get_installation_id_for_repo(owner: str, repo: str) -> int:
         HTTPError: for other HTTP errors (401/403/5xx).
     """
     url = f"{GH_API}/repos/{owner}/{repo}/installation"
-    r = requests.get(url, headers=_headers_as_app(), timeout=_REQUEST_TIMEOUT)
+    r = GH_SESSION.get(url, headers=_headers_as_app(), timeout=_REQUEST_TIMEOUT)
     if r.status_code == 200:
         return int(r.json()["id"])
     if r.status_code == 404:
@@ -175,6 +263,27 @@ def get_installation_id_for_repo(owner: str, repo: str) -> int:
     raise RuntimeError("Unexpected response while fetching installation id")
 
 
+def _cached_installation_id_for_repo(owner: str, repo: str) -> int:
+    """`get_installation_id_for_repo`, memoized for a few minutes per repository."""
+    key = (owner, repo)
+    now = _now_ts()
+    with _installation_id_cache_lock:
+        cached = _installation_id_cache.get(key)
+    if cached and now - cached[1] < _INSTALLATION_ID_TTL_SECONDS:
+        return cached[0]
+
+    installation_id = get_installation_id_for_repo(owner, repo)
+    with _installation_id_cache_lock:
+        _installation_id_cache[key] = (installation_id, now)
+    return installation_id
+
+
+def _evict_installation_id(owner: str, repo: str) -> None:
+    """Forget the cached installation id of `owner/repo` so the next lookup re-resolves it."""
+    with _installation_id_cache_lock:
+        _installation_id_cache.pop((owner, repo), None)
+
+
 def get_installation_token(owner: str, repo: str, *, require_write: bool = False) -> str:
     """
     Return a valid **installation access token** for `owner/repo`.
@@ -198,24 +307,39 @@ def get_installation_token(owner: str, repo: str, *, require_write: bool = False
         - Uses a thread-safe in-memory cache keyed by installation id.
         - Re-mints tokens when the cached token is missing, lacks required
           permission (for `require_write=True`), or is near expiry.
+        - Concurrent misses for one installation share a single mint.
     """
-    installation_id = get_installation_id_for_repo(owner, repo)
+    installation_id = _cached_installation_id_for_repo(owner, repo)
 
     # First, try to serve from cache. This already honors `require_write`.
     cached = _get_cached_installation_token(installation_id, require_write=require_write)
     if cached:
         return cached
 
-    # Otherwise mint a fresh token and update cache
-    tok = _create_installation_token(installation_id)
-    permissions = (tok.get("permissions") or {})
-
-    with _token_cache_lock:
-        _token_cache[installation_id] = {
-            "token": tok["token"],
-            "permissions": permissions,
-            "expires_at": tok["expires_at"],
-        }
+    # Otherwise mint a fresh token (or join a mint already in flight)
+    try:
+        entry = _mint_installation_token(installation_id)
+    except HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        if status not in (401, 404):
+            raise
+        # The cached installation id is stale, or on 401 the cached App JWT was
+        # rejected; re-resolve the id (raises GitHubNotInstalledError if the App
+        # is gone) and mint once more
+        if status == 401:
+            _evict_app_jwt()
+        _evict_installation_id(owner, repo)
+        installation_id = _cached_installation_id_for_repo(owner, repo)
+        try:
+            entry = _mint_installation_token(installation_id)
+        except HTTPError as retry_err:
+            if retry_err.response is None or retry_err.response.status_code != 404:
+                raise
+            _evict_installation_id(owner, repo)
+            raise GitHubNotInstalledError(
+                f"GitHub App is not installed or not granted access to {owner}/{repo}."
+            ) from retry_err
+    permissions = entry["permissions"]
 
     if require_write and permissions.get("contents") != "write":
         # Token minted but app lacks write; signal to caller
@@ -223,4 +347,4 @@ def get_installation_token(owner: str, repo: str, *, require_write: bool = False
             f"GitHub App does not have 'contents: write' permission on {owner}/{repo}."
         )
 
-    return tok["token"]
+    return entry["token"]
@@ -1,24 +1,30 @@
+import atexit
+import os
 import threading
 import time
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, Future, wait
 from enum import IntEnum
 from pathlib import Path
 from typing import Iterable, Literal
 
-from git import GitCommandError, Repo, GitError, Actor
+from git import GitCommandError, Repo, GitError, Actor, UnmergedEntriesError
 
 from .auth import get_installation_token
 from .config import BOT_NAME, BOT_EMAIL
 from .errors import GitHubNotInstalledError, GitHubPermissionError
-from .ops import clone, sync_with_remote, authed_remote, count_commits_between, bot_identity_env
+from .ops import (
+    clone, sync_with_remote, authed_remote, has_commits_not_in, bot_identity_env, checkout_branch, has_ref,
+)
 from .repo_fs import repo_dest
 from .urls import canonical_repo_url, owner_repo_from_url
 
 from label_app.utils.lock import lock
+from label_app.utils.token_bucket import TokenBucket
 
 # limit accesses to remote
 POLL_TIMEOUT = 5
+MAX_POLL_TIMEOUT = 2 * 60  # idle trackers back off to this poll interval
 PULL_TIMEOUT = 15 * 60
 PUSH_TIMEOUT = 5 * 60
 AUTO_COMMIT_TIMEOUT = 5 * 60
@@ -33,9 +39,6 @@ class RepoStatus(IntEnum):
     OK = 3
 
 
-REPO_LOCKS: dict[Path, threading.RLock] = defaultdict(threading.RLock)
-
-
 class BranchTracker:
     def __init__(self, repo_url: str, branch: str) -> None:
         self.url = canonical_repo_url(repo_url)
@@ -50,16 +53,21 @@ class BranchTracker:
         }
 
         self._repo = None
-        self.path = repo_dest(repo_url, branch)  # unique per (repo, branch) combo
+        self._initialized = False
+        self.path = repo_dest(self.url, branch)  # unique per (repo, branch) combo
+        # one lock per checkout: it is held across network I/O, so never share it between repos
+        self._repo_lock = threading.RLock()
         self.logging_prefix = f"[tracker-{self.path.name}]"
 
-        # WARNING: do not grab repo lock before releasing time lock
-        self._time_lock = threading.RLock()
-        self._last_push_time: dict[Literal["tracking", "staging"], float | None] = {"tracking": None, "staging": None}
-        self._last_pull_time = None
-        self._last_merge_time = None
-        self._last_token_refresh_time = None
-        self._last_auto_commit_time = None
+        # rate limits for remote/periodic operations (at most once per timeout unless forced)
+        self._push_buckets: dict[Literal["tracking", "staging"], TokenBucket] = {
+            "tracking": TokenBucket(PUSH_TIMEOUT), "staging": TokenBucket(PUSH_TIMEOUT)
+        }
+        self._pull_bucket = TokenBucket(PULL_TIMEOUT)
+        self._token_refresh_bucket = TokenBucket(TOKEN_REFRESH_TIMEOUT)
+        self._auto_commit_bucket = TokenBucket(AUTO_COMMIT_TIMEOUT)
+        # .git/index mtime seen by the last auto-commit check; unchanged => nothing new staged
+        self._checked_index_mtime_ns: int | None = None
 
         self._token = None
         self._repo_status = None
@@ -77,11 +85,11 @@ class BranchTracker:
 
     @property
     def last_merge_time(self) -> float | None:
-        return self._last_pull_time
+        return self._pull_bucket.last_acquired
 
     @property
     def last_pull_time(self) -> float | None:
-        return self._last_pull_time
+        return self._pull_bucket.last_acquired
 
     @property
     def repo_status(self) -> RepoStatus | None:
@@ -93,10 +101,13 @@ class BranchTracker:
 
     @property
     def repo_lock(self) -> threading.RLock:
-        return REPO_LOCKS[self.path]
+        return self._repo_lock
 
     def is_initialized(self) -> bool:
-        return (self.path / ".git").exists()
+        # one-way latch: once cloned, the checkout doesn't disappear (reset() re-probes)
+        if not self._initialized:
+            self._initialized = (self.path / ".git").exists()
+        return self._initialized
 
     def _init(self):
         """IMPORTANT: not thread-safe. Make sure to lock self.repo_lock"""
@@ -146,20 +157,10 @@ class BranchTracker:
                 print(f"{self.logging_prefix} Token acquisition failed")
 
     def pull_remote(self, *, force: bool = False) -> None:
-        with self._time_lock:
-            time_since_last_pull = float("inf")
-            if self._last_pull_time is not None:
-                time_since_last_pull = time.time() - self._last_pull_time
-            wait_time = max(0.0, PULL_TIMEOUT - time_since_last_pull)
-
-            if not force:
-                if wait_time > 0:
-                    return
-
-                if self._repo_status is RepoStatus.INACCESSIBLE:
-                    return
-
-            self._last_pull_time = time.time()
+        if not force and self._repo_status is RepoStatus.INACCESSIBLE:
+            return
+        if not self._pull_bucket.try_acquire(force=force):
+            return
 
         with self.repo_lock:
             try:
@@ -178,6 +179,7 @@ class BranchTracker:
         self._token = None
         self._repo_status = None
         self._is_private = False  # assume public
+        self._initialized = False
 
         print(f"{self.logging_prefix} Resetting")
 
@@ -196,16 +198,8 @@ class BranchTracker:
             self._monitor_thread.start()
 
     def refresh_token(self, force: bool = False) -> None:
-        with self._time_lock:
-            time_since_last_refresh = float("inf")
-            if self._last_token_refresh_time is not None:
-                time_since_last_refresh = time.time() - self._last_token_refresh_time
-            wait_time = max(0.0, TOKEN_REFRESH_TIMEOUT - time_since_last_refresh)
-
-            if not force and wait_time > 0.0:
-                return
-
-            self._last_token_refresh_time = time.time()
+        if not self._token_refresh_bucket.try_acquire(force=force):
+            return
 
         try:
             self._token = get_installation_token(self.owner, self.repo_name, require_write=True)
@@ -231,12 +225,12 @@ class BranchTracker:
 
         with self.repo_lock:
             # Ensure tracked branch exists locally
-            if self.tracking_branch not in self.repo.heads:
+            if not has_ref(self.repo, f"refs/heads/{self.tracking_branch}"):
                 raise GitCommandError(f"Branch '{self.tracking_branch}' not found locally", 128)
 
             # If staging branch exists, switch to it
-            if self.staging_branch in self.repo.heads:
-                self.repo.git.checkout(self.staging_branch)
+            if has_ref(self.repo, f"refs/heads/{self.staging_branch}"):
+                checkout_branch(self.repo, self.staging_branch)
                 return
 
             remote_staging = getattr(self.repo.remotes.origin.refs, self.staging_branch, None)
@@ -252,16 +246,8 @@ class BranchTracker:
             self.push_branch("staging", force=True)
 
     def push_branch(self, branch: Literal["tracking", "staging"], *, force: bool = False) -> None:
-        with self._time_lock:
-            time_since_last_push = float("inf")
-            if self._last_push_time[branch] is not None:
-                time_since_last_push = time.time() - self._last_push_time[branch]
-            wait_time = max(0.0, PUSH_TIMEOUT - time_since_last_push)
-
-            if not force and wait_time > 0.0:
-                return
-
-            self._last_push_time[branch] = time.time()
+        if not self._push_buckets[branch].try_acquire(force=force):
+            return
 
         branch_name = self.branch_names[branch]
         print(f"{self.logging_prefix} Pushing {branch_name}")
@@ -301,13 +287,13 @@ class BranchTracker:
             self.pull_remote(force=True)
 
             # Ensure both branches exist locally
-            if self.tracking_branch not in self.repo.heads:
+            if not has_ref(self.repo, f"refs/heads/{self.tracking_branch}"):
                 raise GitCommandError(f"Branch '{self.tracking_branch}' not found locally", 128)
-            if self.staging_branch not in self.repo.heads:
+            if not has_ref(self.repo, f"refs/heads/{self.staging_branch}"):
                 raise GitCommandError(f"Staging branch '{self.staging_branch}' not found locally", 128)
 
             # 2) Rebase staging onto tracked (tracked priority on conflict)
-            self.repo.git.checkout(self.staging_branch)
+            checkout_branch(self.repo, self.staging_branch)
             try:
                 with bot_identity_env(self.repo, BOT_NAME, BOT_EMAIL):
                     self.repo.git.rebase(
@@ -333,35 +319,36 @@ class BranchTracker:
             # 4) push asap before the remote diverged
             self.push_branch("tracking", force=True)
 
-            # 5) Reset staging to tracked (hard update)
-            self.repo.git.checkout(self.staging_branch)
-            self.repo.git.reset("--hard", self.tracking_branch)
+            # 5) Reset staging to tracked (hard update): switch + reset in one git call
+            self.repo.git.checkout("-f", "-B", self.staging_branch, self.tracking_branch)
             self.push_branch("staging", force=True)
 
     def auto_commit(self, force: bool = False) -> None:
-        with self._time_lock:
-            time_since_last_commit = float("inf")
-            if self._last_auto_commit_time is not None:
-                time_since_last_commit = time.time() - self._last_auto_commit_time
-            wait_time = max(0.0, AUTO_COMMIT_TIMEOUT - time_since_last_commit)
-
-            if not force and wait_time > 0.0:
-                return
+        """
+        Commit pending changes on the staging branch with the bot identity.
 
-            self._last_auto_commit_time = time.time()
+        Non-forced calls only look at the repo when `.git/index` changed since the
+        last check, i.e. they commit changes that were already staged. Untracked
+        files and unstaged edits don't touch the index, so they are only picked up
+        by a forced call or together with the next staged change.
+        """
+        if not self._auto_commit_bucket.try_acquire(force=force):
+            return
 
         if not self.is_initialized():
             print(f"{self.logging_prefix} Cannot auto-commit on non-initialized repo")
             return
 
+        # all writers stage their files, so an untouched index means there is nothing staged to commit
+        if not force and self._index_mtime_ns() == self._checked_index_mtime_ns:
+            return
+
         with self.repo_lock:
             # ensure we're on staging
             self.ensure_staging_branch()
 
-            # detect staged changes (including new files)
-            staged = self.repo.index.diff("HEAD")
-            untracked = self.repo.untracked_files
-            if staged or untracked:
+            # detect staged changes (including new files); untracked scan only if nothing is staged
+            if self._has_staged_changes() or self.repo.untracked_files:
                 # add everything, commit with bot identity
                 self.repo.git.add("--all")
                 author = Actor(BOT_NAME, BOT_EMAIL)
@@ -372,24 +359,47 @@ class BranchTracker:
                 )
                 print(f"{self.logging_prefix} Auto-committed staging changes")
 
+            self._checked_index_mtime_ns = self._index_mtime_ns()
+
+    def _has_staged_changes(self) -> bool:
+        """
+        Compare the tree the index would write with HEAD's tree, in-process (no `git diff`).
+
+        Not read-only: `write_tree` stores the index's tree objects in `.git/objects`.
+        An unborn HEAD or a conflicted index counts as having changes.
+        """
+        try:
+            head_tree = self.repo.head.commit.tree
+        except ValueError:
+            # unborn HEAD: nothing committed yet
+            return True
+        try:
+            return self.repo.index.write_tree().binsha != head_tree.binsha
+        except UnmergedEntriesError:
+            return True
+
+    def _index_mtime_ns(self) -> int | None:
+        try:
+            return os.stat(self.path / ".git" / "index").st_mtime_ns
+        except FileNotFoundError:
+            return None
+
     def monitor_branches(self) -> None:
         branches: list[Literal["tracking", "staging"]] = ["tracking", "staging"]
+        idle_ticks = 0  # consecutive ticks without local commits, pushes or syncs
+        last_staging_sha = None
         while True:
-            time.sleep(POLL_TIMEOUT)
+            time.sleep(min(POLL_TIMEOUT * 2 ** idle_ticks, MAX_POLL_TIMEOUT))
             if not self.is_initialized() or self._repo_status is not RepoStatus.OK:
                 # periodically poll the remote until access issues are resolved and it is cloned
                 self.pull_remote()
+                idle_ticks = min(idle_ticks + 1, 8)
                 continue
 
             # determine if any of the branches need push
-            push_needed: dict[Literal["tracking", "staging"], bool] = {"tracking": False, "staging": False}
-            for branch in branches:
-                with self._time_lock:
-                    time_since_last_push = float("inf")
-                    if self._last_push_time[branch] is not None:
-                        time_since_last_push = time.time() - self._last_push_time[branch]
-
-                    push_needed[branch] = (time_since_last_push > PUSH_TIMEOUT)
+            push_needed: dict[Literal["tracking", "staging"], bool] = {
+                branch: self._push_buckets[branch].available() for branch in branches
+            }
 
             with self.repo_lock:  # freeze the repo for the duration of the pull-push cycle
                 # auto-commit any staged changes on staging (no more than once per AUTO_COMMIT_TIMEOUT)
@@ -400,21 +410,22 @@ class BranchTracker:
                     remote = f"origin/{local}"
 
                     # if remote ref doesn't exist, assume all local commits are unpushed
-                    if remote not in self.repo.refs:
+                    if not has_ref(self.repo, f"refs/remotes/{remote}"):
                         push_needed[branch] &= True
                         continue
 
-                    commits_not_in_remote, _ = count_commits_between(self.repo, local, remote)
-                    push_needed[branch] &= (commits_not_in_remote > 0)
+                    push_needed[branch] &= has_commits_not_in(self.repo, local, remote)
 
                 # If staging branch has been inactive AND has commits not on tracking, do the sync
                 # i.e. squash-merge staging into tracking and push both
-                staging_head = self.repo.heads[self.staging_branch].commit.committed_date
-                time_since_last_commit = time.time() - staging_head
+                staging_commit = self.repo.heads[self.staging_branch].commit
+                busy = staging_commit.binsha != last_staging_sha
+                last_staging_sha = staging_commit.binsha
+                time_since_last_commit = time.time() - staging_commit.committed_date
                 if time_since_last_commit > MERGE_SQUASHED_AFTER_INACTIVE:
-                    _, only_staging = count_commits_between(self.repo, self.tracking_branch, self.staging_branch)
-                    if only_staging > 0:
+                    if has_commits_not_in(self.repo, self.staging_branch, self.tracking_branch):
                         print(f"{self.logging_prefix} Long period of inactivity with pending staging commits — syncing")
+                        busy = True
                         try:
                             self.sync_with_staging_branch()
                             # clear push flags so we don't double-push
@@ -429,29 +440,59 @@ class BranchTracker:
                     if do_push:
                         self.push_branch(branch)
 
+            # poll quickly while there is activity, back off exponentially while idle
+            busy |= any(push_needed.values())
+            idle_ticks = 0 if busy else min(idle_ticks + 1, 8)
+
 
 REPO_PATH_TO_TRACKER: dict[Path, BranchTracker] = {}
 TRACKERS: dict[(str, str), BranchTracker] = {}
+# Guards only the dicts above (and _TRACKER_KEY_LOCKS); never held during network I/O
 TRACKER_ACCESS_LOCK = threading.Lock()
+# Serializes construction of one (url, branch) tracker without blocking the others;
+# an entry only lives until its tracker is registered in TRACKERS
+_TRACKER_KEY_LOCKS: dict[tuple[str, str], threading.Lock] = defaultdict(threading.Lock)
+# Shared by ensure_trackers/reset_trackers instead of spinning up a pool per call
+_TRACKER_POOL = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="tracker-init")
+atexit.register(_TRACKER_POOL.shutdown, wait=False, cancel_futures=True)
+
+
+def _wait_and_report(caller: str, futures: dict[Future, tuple[str, str]]) -> None:
+    """Block until all `futures` finish and print the ones that failed (callers handle keys individually)."""
+    wait(futures)
+    for future, key in futures.items():
+        exc = future.exception()
+        if exc is not None:
+            print(f"[{caller}] Failed for {key}: {exc}")
+
+
+def _ensure_tracker(url_and_branch: tuple[str, str]) -> BranchTracker:
+    """Thread-safe. The (slow) construction runs outside TRACKER_ACCESS_LOCK."""
+    with TRACKER_ACCESS_LOCK:
+        tracker = TRACKERS.get(url_and_branch)
+        if tracker is not None:
+            return tracker
+        key_lock = _TRACKER_KEY_LOCKS[url_and_branch]
+
+    with key_lock:
+        # another caller may have finished constructing it while we waited
+        with TRACKER_ACCESS_LOCK:
+            tracker = TRACKERS.get(url_and_branch)
+        if tracker is not None:
+            return tracker
+
+        url, branch = url_and_branch
+        tracker = BranchTracker(repo_url=url, branch=branch)
+        with TRACKER_ACCESS_LOCK:
+            TRACKERS[url_and_branch] = tracker
+            REPO_PATH_TO_TRACKER[tracker.path] = tracker
+            # later callers find the tracker in TRACKERS and never need the key lock
+            _TRACKER_KEY_LOCKS.pop(url_and_branch, None)
+        return tracker
 
 
-def _ensure_tracker(url_and_branch: tuple[str, str]):
-    """WARNING: not thread-safe. Make sure the TRACKER_ACCESS_LOCK is locked"""
-    if url_and_branch in TRACKERS:
-        return
-
-    url, branch = url_and_branch
-    tracker = BranchTracker(repo_url=url, branch=branch)
-    TRACKERS[url_and_branch] = tracker
-    REPO_PATH_TO_TRACKER[tracker.path] = tracker
-
-
-@lock(TRACKER_ACCESS_LOCK)
 def get_branch_tracker(repo_url: str, branch: str) -> BranchTracker:
-    repo_url = canonical_repo_url(repo_url)
-    key = (repo_url, branch)
-    _ensure_tracker(key)
-    return TRACKERS[key]
+    return _ensure_tracker((canonical_repo_url(repo_url), branch))
 
 
 @lock(TRACKER_ACCESS_LOCK)
@@ -470,33 +511,37 @@ def get_responsible_tracker(absolute_path: str | Path) -> BranchTracker:
                        f"Please use `ensure_trackers` to ensure all repository trackers exist")
 
 
-@lock(TRACKER_ACCESS_LOCK)
 def ensure_trackers(url_and_branch: Iterable[tuple[str, str]]):
     canonical_keys = [(canonical_repo_url(url), branch) for url, branch in url_and_branch]
-    non_ensured = [key for key in canonical_keys if key not in TRACKERS]
+    with TRACKER_ACCESS_LOCK:
+        non_ensured = list(dict.fromkeys(key for key in canonical_keys if key not in TRACKERS))
     if not len(non_ensured):
         return
 
-    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
-        executor.map(_ensure_tracker, non_ensured)
+    futures = {_TRACKER_POOL.submit(_ensure_tracker, key): key for key in non_ensured}
+    _wait_and_report("ensure_trackers", futures)
 
 
 def _reset_tracker(url_and_branch: tuple[str, str]):
-    if url_and_branch not in TRACKERS:
+    with TRACKER_ACCESS_LOCK:
+        tracker = TRACKERS.get(url_and_branch)
+    if tracker is None:
         return
-    TRACKERS[url_and_branch].reset()
+    # concurrent resets of one tracker serialize on its own repo lock
+    with tracker.repo_lock:
+        tracker.reset()
 
 
-@lock(TRACKER_ACCESS_LOCK)
 def reset_trackers(url_and_branch: Iterable[tuple[str, str]]):
     canonical_keys = [(canonical_repo_url(url), branch) for url, branch in url_and_branch]
-    not_initialized = [key for key in canonical_keys if key not in TRACKERS]
+    with TRACKER_ACCESS_LOCK:
+        not_initialized = [key for key in canonical_keys if key not in TRACKERS]
+        initialized = [key for key in canonical_keys if key in TRACKERS]
     if len(not_initialized):
         print(f"[reset_trackers] Some of the requested trackers are not initialized: {not_initialized}")
 
-    initialized = [key for key in canonical_keys if key in TRACKERS]
     if not len(initialized):
         return
 
-    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
-        executor.map(_reset_tracker, initialized)
+    futures = {_TRACKER_POOL.submit(_reset_tracker, key): key for key in initialized}
+    _wait_and_report("reset_trackers", futures)
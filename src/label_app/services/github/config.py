@@ -27,6 +27,7 @@ from __future__ import annotations
 from pathlib import Path
 
 import streamlit as st
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
 from platformdirs import user_cache_dir
 
 # --------------------------------------------------------------------------- #
@@ -85,6 +86,8 @@ _app = _require_github_app_secrets()
 # Note: coerce APP_ID to str because TOML/YAML may parse numeric ids as ints.
 CLIENT_ID: str = str(_app["client_id"])
 APP_PRIVATE_KEY: str = _app["private_key_pem"]
+# Parsed once so signing the App JWT doesn't re-decode the PEM every time
+APP_PRIVATE_KEY_OBJ = load_pem_private_key(APP_PRIVATE_KEY.encode(), password=None)
 APP_SLUG: str = _app["slug"]
 BOT_SIGN_ID: str = _app["commit_sign_id"]
 
@@ -98,6 +101,7 @@ __all__ = [
     "USER_AGENT",
     "CLIENT_ID",
     "APP_PRIVATE_KEY",
+    "APP_PRIVATE_KEY_OBJ",
     "APP_SLUG",
     "BOT_NAME",
     "BOT_EMAIL"
@@ -24,6 +24,7 @@ Notes
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from typing import Optional, Dict, List
 from urllib.parse import urlencode
@@ -31,19 +32,24 @@ from urllib.parse import urlencode
 import requests
 
 from .config import GH_API, USER_AGENT
+from .session import GH_SESSION
+
+# GitHub accepts at most this many `repository_ids[]` per link
+_MAX_REPO_IDS = 100
+# Parallel anonymous repo-id lookups
+_LOOKUP_WORKERS = 16
 
 
 # --------------------------------------------------------------------------- #
 # HTTP utilities
 # --------------------------------------------------------------------------- #
 
-def _headers_common() -> dict:
-    """Headers for unauthenticated GitHub REST calls."""
-    return {
-        "Accept": "application/vnd.github+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-        "User-Agent": f"{USER_AGENT} install-link",
-    }
+# Headers for unauthenticated GitHub REST calls (never mutated)
+_HEADERS_COMMON = {
+    "Accept": "application/vnd.github+json",
+    "X-GitHub-Api-Version": "2022-11-28",
+    "User-Agent": f"{USER_AGENT} install-link",
+}
 
 
 # --------------------------------------------------------------------------- #
@@ -64,7 +70,7 @@ def get_owner_profile(owner: str) -> Dict[str, Optional[str | int]]:
     We call GET /users/{owner} (works for both users and orgs).
     """
     try:
-        r = requests.get(f"{GH_API}/users/{owner}", headers=_headers_common(), timeout=10)
+        r = GH_SESSION.get(f"{GH_API}/users/{owner}", headers=_HEADERS_COMMON, timeout=10)
         if r.status_code == 200:
             data = r.json()
             return {
@@ -89,7 +95,7 @@ def _get_repo_id(owner: str, repo: str) -> Optional[int]:
     the owner preselected and the user can pick repos there.
     """
     try:
-        r = requests.get(f"{GH_API}/repos/{owner}/{repo}", headers=_headers_common(), timeout=10)
+        r = GH_SESSION.get(f"{GH_API}/repos/{owner}/{repo}", headers=_HEADERS_COMMON, timeout=10)
         if r.status_code == 200:
             return int(r.json()["id"])
     except requests.RequestException:
@@ -155,15 +161,17 @@ def build_install_link_for_many(app_slug: str, owner: str, repos: list[str]) ->
 
     params: List[tuple[str, str]] = [("suggested_target_id", str(owner_id))]
 
-    # Resolve as many repo IDs as we can (up to 100)
-    count = 0
-    for repo in unique_repos:
-        if count >= 100:
-            break
-        rid = _get_repo_id(owner, repo)
-        if rid:
-            params.append(("repository_ids[]", str(rid)))
-            count += 1
+    # Resolve as many repo IDs as we can (up to 100), a batch of lookups at a time
+    repo_ids: List[int] = []
+    with ThreadPoolExecutor(max_workers=_LOOKUP_WORKERS) as executor:
+        start = 0
+        while len(repo_ids) < _MAX_REPO_IDS and start < len(unique_repos):
+            batch = unique_repos[start:start + _MAX_REPO_IDS - len(repo_ids)]
+            start += len(batch)
+            # map() preserves input order, so the link stays deterministic
+            repo_ids.extend(rid for rid in executor.map(lambda r: _get_repo_id(owner, r), batch) if rid)
+
+    params.extend(("repository_ids[]", str(rid)) for rid in repo_ids)
 
     return f"{base}?{urlencode(params)}"
 
@@ -6,23 +6,86 @@ Core Git functions with **no Streamlit dependencies**. The workflow prefers
 installation token only when anonymous access fails (e.g., private repos).
 
 Public API:
-- authed_https_for_app(base_https_url, token) -> str
-- with_authed_remote(repo, token) -> context manager
+- authed_remote(repo, token) -> context manager
+- checkout_branch(repo, branch) -> None
+- has_ref(repo, ref_path) -> bool
 - clone_or_pull_core(url, branch=None) -> Path
 """
 
 from __future__ import annotations
 
+import atexit
+import base64
+import os
+import random
+import re
+import tempfile
+import time
 from contextlib import contextmanager
-from functools import partial
+from functools import lru_cache, partial
 from pathlib import Path
 from typing import Iterable
-from urllib.parse import urlparse, urlunparse
 
-from git import Repo, GitCommandError, Remote
+from git import Git, Repo, GitCommandError, Remote, SymbolicReference
 
 from .urls import canonical_repo_url
 
+# stderr fragments of git network failures that are worth retrying; anything else
+# (authentication failures, missing refs, ...) fails fast so callers can fall back
+_TRANSIENT_GIT_ERRORS = re.compile(
+    r"early EOF|RPC failed|Connection reset|timed out|Could not resolve host|"
+    r"returned error: 5\d\d|HTTP 5\d\d",
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=1)
+def _supports_partial_clone() -> bool:
+    """`--filter` clones are reliable from git 2.27 on; probed once per process."""
+    return Git().version_info >= (2, 27)
+
+
+@lru_cache(maxsize=1)
+def _supports_config_env() -> bool:
+    """`GIT_CONFIG_COUNT`/`GIT_CONFIG_KEY_<n>` are honored from git 2.31 on; probed once per process."""
+    return Git().version_info >= (2, 31)
+
+
+# Answers git's credential prompts from the environment; used where
+# `GIT_CONFIG_*` is unavailable (git < 2.31)
+_ASKPASS_SCRIPT = """#!/bin/sh
+case "$1" in
+    Username*) echo x-access-token ;;
+    *) echo "$LABEL_APP_GIT_TOKEN" ;;
+esac
+"""
+
+
+@lru_cache(maxsize=1)
+def _askpass_script() -> str:
+    """Path of the askpass helper, written once per process and removed at exit."""
+    fd, path = tempfile.mkstemp(prefix="label-app-askpass-", suffix=".sh")
+    with os.fdopen(fd, "w") as f:
+        f.write(_ASKPASS_SCRIPT)
+    os.chmod(path, 0o700)
+    atexit.register(os.unlink, path)
+    return path
+
+
+def _retry(fn, *, n_max: int = 3, base: float = 1.0, cap: float = 30.0, jitter: float = 0.5):
+    """
+    Call `fn()` and retry transient git network failures up to `n_max` attempts,
+    sleeping with capped exponential backoff and random jitter in between.
+    """
+    for attempt in range(n_max):
+        try:
+            return fn()
+        except GitCommandError as e:
+            if attempt == n_max - 1 or not _TRANSIENT_GIT_ERRORS.search(str(e)):
+                raise
+            delay = min(cap, base * 2 ** attempt)
+            time.sleep(delay * (1 - jitter * random.random()))
+
 
 @contextmanager
 def bot_identity_env(repo, name, email):
@@ -35,43 +98,47 @@ def bot_identity_env(repo, name, email):
         yield
 
 
-def authed_https_for_app(base_https_url: str, token: str) -> str:
+def _auth_env(token: str) -> dict[str, str]:
     """
-    Return an HTTPS remote URL that includes GitHub App credentials:
+    Environment that makes git send the GitHub App token as an HTTP header for
+    github.com requests (the same mechanism actions/checkout uses):
 
-        https://x-access-token:<token>@github.com/<owner>/<repo>.git
+        AUTHORIZATION: basic base64("x-access-token:<token>")
+
+    Passed through `GIT_CONFIG_*` variables, so credentials never touch
+    `.git/config` or the remote URL. Older git ignores those variables; there
+    the token is handed out by a `GIT_ASKPASS` helper instead.
     """
-    p = urlparse(base_https_url)
-    assert p.scheme == "https"
-    netloc = f"x-access-token:{token}@{p.netloc}"
-    return urlunparse(p._replace(netloc=netloc))  # noqa
+    if not _supports_config_env():
+        return {
+            "GIT_ASKPASS": _askpass_script(),
+            "LABEL_APP_GIT_TOKEN": token,
+            "GIT_TERMINAL_PROMPT": "0",
+        }
+
+    # append after any GIT_CONFIG_* entries the process already carries instead of replacing them
+    try:
+        n = int(os.environ.get("GIT_CONFIG_COUNT") or 0)
+    except ValueError:
+        n = 0
+
+    basic = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+    return {
+        "GIT_CONFIG_COUNT": str(n + 1),
+        f"GIT_CONFIG_KEY_{n}": "http.https://github.com/.extraheader",
+        f"GIT_CONFIG_VALUE_{n}": f"AUTHORIZATION: basic {basic}",
+        "GIT_TERMINAL_PROMPT": "0",
+    }
 
 
+@contextmanager
 def authed_remote(repo: Repo, *, token: str):
     """
-    Temporarily set `origin` to an authed URL using the GitHub App token.
-
-    The original (clean) URL is restored on exit, even if an exception occurs.
+    Yield `origin` with every git command in the block authenticated by the
+    GitHub App token. The remote URL and `.git/config` are left untouched.
     """
-    class _Ctx:
-        def __enter__(self) -> Remote:
-            origin: Remote = repo.remotes.origin
-            self._prev_url = origin.url
-            clean = canonical_repo_url(origin.url)
-            origin.set_url(authed_https_for_app(clean, token))
-            return origin
-
-        def __exit__(self, exc_type, exc, tb):
-            try:
-                repo.remotes.origin.set_url(self._prev_url)
-            except Exception:
-                # As a fallback, reset to canonical clean https
-                try:
-                    repo.remotes.origin.set_url(canonical_repo_url(repo.remotes.origin.url))
-                except Exception:
-                    pass
-            return False
-    return _Ctx()
+    with repo.git.custom_environment(**_auth_env(token)):
+        yield repo.remotes.origin
 
 
 def clean_remote(repo: Repo):
@@ -95,10 +162,15 @@ def clean_remote(repo: Repo):
             origin: Remote = repo.remotes.origin
             self._prev_url = origin.url
             clean_url = canonical_repo_url(self._prev_url)
-            origin.set_url(clean_url)
+            # `set-url` spawns git and rewrites .git/config; skip it in the common case
+            self._changed = clean_url != self._prev_url
+            if self._changed:
+                origin.set_url(clean_url)
             return origin
 
         def __exit__(self, exc_type, exc, tb):
+            if not self._changed:
+                return False
             try:
                 repo.remotes.origin.set_url(self._prev_url)
             except Exception:
@@ -112,6 +184,47 @@ def clean_remote(repo: Repo):
     return _Ctx()
 
 
+def _ref_sha(repo: Repo, ref_path: str) -> str | None:
+    """hexsha the full ref `ref_path` points at, or None if it does not exist."""
+    try:
+        return SymbolicReference.dereference_recursive(repo, ref_path)
+    except ValueError:
+        return None
+
+
+def has_ref(repo: Repo, ref_path: str) -> bool:
+    """
+    Whether the full ref `ref_path` (e.g. 'refs/heads/main') exists.
+
+    Resolves just this one ref (loose file or packed-refs) instead of listing
+    every ref the way `name in repo.heads` / `name in repo.refs` does.
+    """
+    return _ref_sha(repo, ref_path) is not None
+
+
+def _remote_heads(origin: Remote, branches: list[str]) -> dict[str, str]:
+    """
+    Tip SHAs of `branches` on `origin` via a single `git ls-remote` (one ref
+    listing round trip, no pack negotiation). Branches missing remotely are omitted.
+    """
+    wanted = {f"refs/heads/{branch}": branch for branch in branches}
+    out = _retry(partial(origin.repo.git.ls_remote, origin.name, *wanted))
+    heads: dict[str, str] = {}
+    for line in out.splitlines():
+        sha, _, ref = line.partition("\t")
+        # ls-remote patterns match on the ref's tail, so keep exact names only
+        if ref in wanted:
+            heads[wanted[ref]] = sha
+    return heads
+
+
+def checkout_branch(repo: Repo, branch: str) -> None:
+    """`git checkout <branch>`, skipped when HEAD already points at it (reading HEAD is in-process)."""
+    head = repo.head
+    if head.is_detached or head.reference.name != branch:
+        repo.git.checkout(branch)
+
+
 def sync_with_remote(
     repo: Repo,
     branches: Iterable[str],
@@ -119,17 +232,17 @@ def sync_with_remote(
     token: str | None = None
 ) -> None:
     """
-    For each branch in `branches`:
-      1. Try `git fetch origin <branch>` (no prune).
-      2. If it succeeded, branch exists remotely:
-         - checkout (or create-and-track) local branch
-         - rebase onto origin/<branch> with “ours” strategy
-      3. If fetch failed with “Couldn't find remote ref”:
-         - simply create a new local branch off HEAD
+    1. List the remote tips of `branches` with `git ls-remote` and fetch (no
+       prune), in a single `git fetch`, only those whose tip differs from the
+       local `origin/<branch>`. Nothing is fetched when the remote is unchanged.
+    2. For each branch:
+       - If it exists remotely: checkout (or create-and-track) local branch and
+         rebase onto origin/<branch> with “ours” strategy
+       - Otherwise: simply create a new local branch off HEAD
 
     Raises:
         GitCommandError:
-            - When `origin.fetch(branch)` fails for reasons other than a missing remote ref.
+            - When `git ls-remote` or `origin.fetch(...)` fails.
             - When `repo.git.checkout(...)` or `repo.git.rebase(...)` encounters Git errors.
         GitCommandNotFound:
             If the underlying `git` executable is not found in the system PATH.
@@ -138,21 +251,26 @@ def sync_with_remote(
     """
     remote_manager = clean_remote if token is None else partial(authed_remote, token=token)
 
+    branches = list(branches)
+
     with remote_manager(repo) as origin:
+        # 1) ask the remote for its tips and fetch only the branches that moved
+        remote_tips = _remote_heads(origin, branches)
+        on_remote = set(remote_tips)
+        stale = [
+            branch for branch, sha in remote_tips.items()
+            if _ref_sha(repo, f"refs/remotes/{origin.name}/{branch}") != sha
+        ]
+        if stale:
+            refspecs = [f"+refs/heads/{branch}:refs/remotes/{origin.name}/{branch}" for branch in stale]
+            _retry(partial(origin.fetch, refspecs))
+
         for branch in branches:
-            # 1) detect remote existence
-            try:
-                origin.fetch(branch)
-                exists_on_remote = True
-            except GitCommandError as e:
-                if "Couldn't find remote ref" in str(e):
-                    exists_on_remote = False
-                else:
-                    raise
+            exists_on_remote = branch in on_remote
 
             # 2) checkout or create
-            if branch in repo.heads:
-                repo.git.checkout(branch)
+            if has_ref(repo, f"refs/heads/{branch}"):
+                checkout_branch(repo, branch)
             else:
                 if exists_on_remote:
                     # create & track origin/branch
@@ -180,11 +298,15 @@ def sync_with_remote(
 
 def clone(base_https: str, dest: Path, *, token: str | None = None) -> None:
     """
-    Clone a repository using an optionally authenticated URL, then reset the origin remote URL
-    to the clean HTTP URL to avoid storing credentials in `.git/config`.
+    Clone a repository, optionally authenticated with the GitHub App `token`.
+
+    The token is passed to git as an HTTP header through the environment, so the
+    clean URL is what ends up in `.git/config`.
 
-    Uses a temporary URL embedding the provided `token` for authentication, then
-    restores the remote.
+    Anonymous clones are blobless (`--filter=blob:none`, git >= 2.27) and skip tags: only the
+    blobs of checked-out commits are downloaded, older ones are fetched lazily
+    from the (public) origin when needed. Authenticated clones stay full because
+    lazy fetches outside `authed_remote` would carry no credentials.
 
     Raises:
         GitCommandError: If the `git clone` command fails with a non-zero exit status.
@@ -193,26 +315,25 @@ def clone(base_https: str, dest: Path, *, token: str | None = None) -> None:
             ([gitpython.readthedocs.io](https://gitpython.readthedocs.io/en/3.1.14/reference.html))
         OSError: On filesystem or subprocess failures (e.g., permission issues, execution failures).
             ([docs.python.org](https://docs.python.org/3/library/subprocess.html))
-        InvalidGitRepositoryError: If the cloned directory is invalid when opening with `Repo(dest)`.
-            ([gitpython.readthedocs.io](https://gitpython.readthedocs.io/en/3.1.14/reference.html))
-        NoSuchPathError: If the destination path is invalid when instantiating `Repo(dest)`.
-            ([gitpython.readthedocs.io](https://gitpython.readthedocs.io/en/3.1.14/reference.html))
     """
-    url = base_https
+    env = None
+    multi_options = ["--filter=blob:none", "--no-tags"] if _supports_partial_clone() else []
     if token is not None:
-        url = authed_https_for_app(base_https, token)
+        env = _auth_env(token)
+        multi_options = []
 
-    Repo.clone_from(url, dest)
-    repo = Repo(dest)
-    repo.remotes.origin.set_url(base_https)
+    _retry(partial(Repo.clone_from, base_https, dest, env=env, multi_options=multi_options))
 
 
-def count_commits_between(repo: Repo, ref_a: str, ref_b: str) -> tuple[int, int]:
+def has_commits_not_in(repo: Repo, ref_a: str, ref_b: str) -> bool:
     """
-    Return a tuple (ahead, behind) where
-      - ahead  = number of commits in ref_a that are not in ref_b
-      - behind = number of commits in ref_b that are not in ref_a
+    Return True if `ref_a` has commits that are not in `ref_b`.
+
+    Resolves both refs in-process and only asks git for ancestry when the tips
+    differ, instead of counting commits over the whole history range.
     """
-    ahead = int(repo.git.rev_list("--count", f"{ref_b}..{ref_a}"))
-    behind = int(repo.git.rev_list("--count", f"{ref_a}..{ref_b}"))
-    return ahead, behind
+    commit_a = repo.commit(ref_a)
+    commit_b = repo.commit(ref_b)
+    if commit_a.binsha == commit_b.binsha:
+        return False
+    return not repo.is_ancestor(commit_a, commit_b)
@@ -23,10 +23,9 @@ from __future__ import annotations
 
 import re
 from pathlib import Path
-from urllib.parse import urlparse
 
 from .config import CACHE_DIR
-from .urls import parse_github_url
+from .urls import owner_repo_from_url
 
 
 # Characters allowed in a single path segment on most platforms.
@@ -71,10 +70,7 @@ def repo_dest(url: str, branch: str | None) -> Path:
     Raises:
         ValueError: if the URL cannot be parsed as a GitHub repository.
     """
-    canon, _, _ = parse_github_url(url)
-    p = urlparse(canon)
-    owner, repo_git = p.path.strip("/").split("/")[-2:]
-    repo = repo_git[:-4] if repo_git.endswith(".git") else repo_git
+    owner, repo = owner_repo_from_url(url)
 
     suffix = _sanitize_branch_suffix(branch)
     dest = CACHE_DIR / owner / f"{repo}_{suffix}"
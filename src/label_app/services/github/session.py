@@ -0,0 +1,28 @@
+"""
+session.py — shared HTTP session for GitHub REST calls.
+
+Every module in this package talks to the same host, so a single
+`requests.Session` keeps TLS connections to api.github.com alive across
+calls (and threads) instead of handshaking on each request. Idempotent
+requests are retried a couple of times on transient 5xx gateway errors.
+
+Public API:
+- GH_SESSION
+"""
+
+from __future__ import annotations
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# raise_on_status=False hands the last response back so callers keep their status handling
+_RETRY = Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504), raise_on_status=False)
+
+GH_SESSION = requests.Session()
+GH_SESSION.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=_RETRY))
+
+
+__all__ = [
+    "GH_SESSION",
+]
@@ -32,12 +32,17 @@ Notes
 
 from __future__ import annotations
 
+import re
 from functools import lru_cache
 from urllib.parse import urlparse, unquote
 from typing import Tuple
 
+# The common shape: plain https://github.com/<owner>/<repo>(.git)(/) with nothing else
+# (`;` would start URL params, and a bare `.git` repo name is left to the full parser)
+_FAST = re.compile(r"^https://github\.com/([^/?#@;]+)/(?!\.git/?$)([^/?#;]+?)(?:\.git)?/?$")
 
-@lru_cache()
+
+@lru_cache(maxsize=1024)
 def parse_github_url(raw_url: str) -> Tuple[str, str | None, str]:
     """
     Canonicalize a GitHub URL and return (repo_url, branch, subdir).
@@ -59,6 +64,10 @@ def parse_github_url(raw_url: str) -> Tuple[str, str | None, str]:
     """
     s = raw_url.strip()
 
+    fast = _FAST.match(s)
+    if fast:
+        return f"https://github.com/{fast.group(1)}/{fast.group(2)}.git", None, ""
+
     # Handle scp-like SSH: git@github.com:owner/repo(.git)
     if s.startswith("git@github.com:"):
         # Convert to an https-looking string so urlparse can do the rest
@@ -104,12 +113,14 @@ def parse_github_url(raw_url: str) -> Tuple[str, str | None, str]:
     return repo_url, branch, subdir
 
 
+@lru_cache(maxsize=2048)
 def canonical_repo_url(url: str) -> str:
     """Return only the canonical HTTPS repo URL for a given GitHub URL."""
     repo_url, _, _ = parse_github_url(url)
     return repo_url
 
 
+@lru_cache(maxsize=2048)
 def owner_repo_from_url(raw_url: str) -> Tuple[str, str]:
     """
     Extract (owner, repo) from any supported GitHub URL.
@@ -3,9 +3,10 @@ from collections import defaultdict
 from pathlib import Path
 from typing import TypeVar
 
-from pydantic import TypeAdapter, ValidationError
+from pydantic import ValidationError
 
 from label_app.data.models import Project, ItemBase
+from label_app.services._cache import adapter_for, list_adapter_for
 
 
 MAX_ERRS_TO_SHOW = 5
@@ -23,35 +24,51 @@ def load_items_by_file(project: Project) -> dict[Path, list[ItemBase]]:
 _ItemType = TypeVar("_ItemType", bound=ItemBase)
 
 
-@functools.lru_cache(maxsize=1024)
-def load_file_items(item_type: _ItemType, rel_path: Path, project_root: Path) -> list[_ItemType]:
-    adapter = TypeAdapter(item_type)
-    path = project_root.joinpath(rel_path)
-    items = []
+def _read_item_lines(path: Path) -> list[tuple[int, bytes]]:
+    """Return (lineno, raw) for every non-blank, non-comment line of a JSONL file."""
+    lines = []
+    for lineno, raw in enumerate(path.read_bytes().split(b"\n")):
+        # Trim whitespace once, then handle blank/comment lines
+        raw = raw.strip()
+        if not raw:
+            continue
 
-    with path.open("rb") as f:
-        item_idx = 0
-        for lineno, raw in enumerate(f):
-            # Trim whitespace once, then handle blank/comment lines
-            raw = raw.strip()
-            if not raw:
-                continue
+        # skip comments
+        if raw.startswith(b"#") or raw.startswith(b"//"):
+            continue
 
-            # skip comments
-            if raw.startswith(b"#") or raw.startswith(b"//"):
-                continue
+        lines.append((lineno, raw))
+    return lines
 
-            try:
-                item: _ItemType = adapter.validate_json(raw)
-                # attach derived (non-serialized) metadata
-                item.key = rel_path
-                item.idx = item_idx
-                item_idx += 1
 
-                items.append(item)
+@functools.lru_cache(maxsize=1024)
+def load_file_items(item_type: _ItemType, rel_path: Path, project_root: Path) -> list[_ItemType]:
+    path = project_root.joinpath(rel_path)
+    lines = _read_item_lines(path)
+
+    # Fast path: validate the whole file as one JSON array in pydantic-core
+    try:
+        items: list[_ItemType] = list_adapter_for(item_type).validate_json(
+            b"[" + b",".join(raw for _, raw in lines) + b"]"
+        )
+        if len(items) != len(lines):
+            # a single line smuggled in several values; let the slow path reject it
+            raise ValueError("line/item count mismatch")
+    except (ValidationError, ValueError):
+        # Some line is malformed: fall back to per-line validation to skip it
+        items = []
+        adapter = adapter_for(item_type)
+        for lineno, raw in lines:
+            try:
+                items.append(adapter.validate_json(raw))
             except ValidationError as e:
                 print(f"[load_file_items] {path}:{lineno}: {e}")
 
+    # attach derived (non-serialized) metadata
+    for item_idx, item in enumerate(items):
+        item.key = rel_path
+        item.idx = item_idx
+
     return items
 
 
@@ -1,11 +1,11 @@
 import json
-import re
 from pathlib import Path
 from typing import Any
 
 import streamlit as st
 from platformdirs import user_cache_dir
 
+from label_app.services._cache import safe_email
 from label_app.ui.components.auth import is_logged_in, current_user
 
 APP = "label_app"
@@ -18,8 +18,7 @@ CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 @st.cache_data()
 def get_user_file(user: str) -> Path:
-    safe_user = re.sub(r"[^a-zA-Z0-9._-]", "_", user)
-    return CACHE_DIR / f"{safe_user}.json"
+    return CACHE_DIR / f"{safe_email(user)}.json"
 
 
 @st.cache_data()
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import os
+from pathlib import Path
+
 import yaml
 import streamlit as st
 
@@ -95,8 +98,13 @@ def discover_projects() -> tuple[dict[str, list[Project]], dict[str, dict]]:
                 discovered[slug] = []
                 continue
 
+            # scandir entries carry the file type from the directory read, so no stat per entry
+            with os.scandir(base) as entries:
+                version_names = sorted(e.name for e in entries if e.is_dir())
+
             versions: list[Project] = []
-            for version_dir in sorted(p for p in base.iterdir() if p.is_dir()):
+            for version_name in version_names:
+                version_dir = Path(base, version_name)
                 yaml_path = version_dir / "project.yaml"
                 if not yaml_path.is_file():
                     continue
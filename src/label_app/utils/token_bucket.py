@@ -0,0 +1,41 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket holding up to `capacity` tokens, refilled at one
+    token per `interval` seconds. Starts full.
+
+    With the default capacity of 1 this is "at most once per `interval`", which
+    is how BranchTracker rate-limits its remote operations.
+    """
+
+    def __init__(self, interval: float, capacity: float = 1.0) -> None:
+        self.interval = interval
+        self.capacity = capacity
+        self.last_acquired: float | None = None  # epoch seconds of the last successful acquire
+
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) / self.interval)
+        self._updated = now
+
+    def try_acquire(self, *, force: bool = False) -> bool:
+        """Take a token if one is available; with `force`, take it anyway (never going below zero)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < 1.0 and not force:
+                return False
+            self._tokens = max(0.0, self._tokens - 1.0)
+            self.last_acquired = time.time()
+            return True
+
+    def available(self) -> bool:
+        """Whether `try_acquire` would currently succeed, without taking a token."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens >= 1.0